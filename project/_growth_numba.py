@@ -0,0 +1,93 @@
+"""
+Numba Growth Kernels
+Single-pass aggregations of registrations used by the growth metrics and growth leaders
+Falls back to equivalent NumPy bincount kernels when numba is not installed
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    # Deployments without numba get the NumPy kernels at the bottom of this module
+    HAVE_NUMBA = False
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+# Window order along the last axis of the kernel output
+CURRENT, PREVIOUS_YEAR, PREVIOUS_QUARTER = 0, 1, 2
+
+# Serial on purpose: the kernels run from concurrent Streamlit script threads, and
+# numba's default workqueue threading layer aborts on simultaneous parallel launches
+@njit(cache=True)
+def growth_kernel(dates, cat_codes, regs, n_categories,
+                  cur_start, cur_end, py_start, py_end, pq_start, pq_end):
+    """
+    Sum registrations per (category, window) in one pass over the data
+    Windows are half-open [start, end) ranges of int64 nanosecond timestamps
+    Returns an (n_categories, 3) array indexed by CURRENT / PREVIOUS_YEAR / PREVIOUS_QUARTER
+    """
+    out = np.zeros((n_categories, 3), dtype=np.int64)
+    for i in range(dates.shape[0]):
+        code = cat_codes[i]
+        if code < 0:
+            continue
+        d = dates[i]
+        if cur_start <= d < cur_end:
+            out[code, CURRENT] += regs[i]
+        if py_start <= d < py_end:
+            out[code, PREVIOUS_YEAR] += regs[i]
+        if pq_start <= d < pq_end:
+            out[code, PREVIOUS_QUARTER] += regs[i]
+    return out
+
+@njit(cache=True)
+def group_period_sum(codes, periods, vals, n_groups):
+    """
+    Sum vals per (group, period) for several group keys in one pass over the rows
+    codes is a (n_keys, n) array of group codes, already offset into a shared
+    0..n_groups-1 range; periods holds 0 (current), 1 (previous) or -1 (neither)
+    Negative codes (missing categories) are skipped
+    Returns an (n_groups, 2) int64 array of [current, previous] sums
+    """
+    out = np.zeros((n_groups, 2), dtype=np.int64)
+    for i in range(vals.shape[0]):
+        p = periods[i]
+        if p < 0:
+            continue
+        for k in range(codes.shape[0]):
+            code = codes[k, i]
+            if code >= 0:
+                out[code, p] += vals[i]
+    return out
+
+def _growth_kernel_numpy(dates, cat_codes, regs, n_categories,
+                         cur_start, cur_end, py_start, py_end, pq_start, pq_end):
+    """
+    NumPy version of growth_kernel: one bincount per window
+    """
+    out = np.zeros((n_categories, 3), dtype=np.int64)
+    valid = cat_codes >= 0
+    windows = ((CURRENT, cur_start, cur_end), (PREVIOUS_YEAR, py_start, py_end),
+               (PREVIOUS_QUARTER, pq_start, pq_end))
+    for window, start, end in windows:
+        mask = valid & (dates >= start) & (dates < end)
+        out[:, window] = np.bincount(cat_codes[mask], weights=regs[mask], minlength=n_categories)
+    return out
+
+def _group_period_sum_numpy(codes, periods, vals, n_groups):
+    """
+    NumPy version of group_period_sum: one bincount per group key over
+    interleaved (group, period) bins
+    """
+    out = np.zeros(2 * n_groups, dtype=np.int64)
+    for key_codes in codes:
+        mask = (periods >= 0) & (key_codes >= 0)
+        bins = key_codes[mask] * 2 + periods[mask]
+        out += np.bincount(bins, weights=vals[mask], minlength=2 * n_groups).astype(np.int64)
+    return out.reshape(n_groups, 2)
+
+if not HAVE_NUMBA:
+    growth_kernel = _growth_kernel_numpy
+    group_period_sum = _group_period_sum_numpy
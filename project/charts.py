@@ -1,13 +1,13 @@
 """
 Chart Creation Module
 Contains functions to create various visualizations for the dashboard
+Plotly resolves its submodules lazily (PEP 562), so only the modules imported here load at startup
 """
 
 import plotly.express as px
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import pandas as pd
 import numpy as np
+import streamlit as st
 
 # Color palette for consistent styling
 COLORS = {
@@ -26,40 +26,62 @@ CATEGORY_COLORS = {
     '4W': COLORS['accent']
 }
 
-def create_trend_chart(df, title):
+# Shared layout settings, built once and reused by every chart
+FONT_LAYOUT = dict(font=dict(family="Arial, sans-serif", size=12), title_font_size=16)
+BASE_LAYOUT = dict(plot_bgcolor='white', paper_bgcolor='white', **FONT_LAYOUT)
+HORIZONTAL_LEGEND = dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+
+# Upper bound on points per line in the trend chart before it is resampled
+MAX_TREND_POINTS = 200
+
+# Title prefix and date-axis label for each trend chart bucket size
+TREND_PERIODS = {
+    'MS': ('Monthly', 'Month'),
+    'QS': ('Quarterly', 'Quarter'),
+    'YS': ('Yearly', 'Year')
+}
+
+@st.cache_data(max_entries=64, ttl=3600)
+def create_trend_chart(_df, filter_sig, title):
     """
     Create a line chart showing registration trends over time
+    Cached by filter signature; _df is the filtered monthly rollup that signature selects
+    The title is prefixed with the bucket size actually plotted (Monthly, Quarterly or Yearly)
     """
-    # Aggregate data by month and category
-    monthly_data = df.groupby([df['date'].dt.to_period('M'), 'vehicle_category'])['registrations'].sum().reset_index()
-    monthly_data['date'] = monthly_data['date'].dt.to_timestamp()
+    df = _df
+    # Rows are already monthly, so pivot categories into columns (summing over manufacturers)
+    wide = df.pivot_table(index='date', columns='vehicle_category', values='registrations',
+                          aggfunc='sum', observed=True)
+    
+    # Coarsen wide date ranges so each trace stays under MAX_TREND_POINTS
+    freq = 'MS'
+    if len(wide) > MAX_TREND_POINTS:
+        freq = 'QS' if len(wide) / 3 <= MAX_TREND_POINTS else 'YS'
+        wide = wide.resample(freq).sum(min_count=1)
+    period_title, period_label = TREND_PERIODS[freq]
+    
+    trend_data = wide.reset_index().melt(
+        id_vars='date', var_name='vehicle_category', value_name='registrations'
+    ).dropna()
+    trend_data['registrations'] = trend_data['registrations'].to_numpy(dtype=np.int32)
     
     fig = px.line(
-        monthly_data,
+        trend_data,
         x='date',
         y='registrations',
         color='vehicle_category',
-        title=title,
+        title=f"{period_title} {title}",
         color_discrete_map=CATEGORY_COLORS,
         labels={
             'registrations': 'Registrations',
-            'date': 'Date',
+            'date': period_label,
             'vehicle_category': 'Category'
         }
     )
     
     fig.update_layout(
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        font=dict(family="Arial, sans-serif", size=12),
-        title_font_size=16,
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1
-        ),
+        **BASE_LAYOUT,
+        legend=HORIZONTAL_LEGEND,
         hovermode='x unified'
     )
     
@@ -67,12 +89,16 @@ def create_trend_chart(df, title):
     
     return fig
 
-def create_manufacturer_chart(df, chart_type, title):
+@st.cache_data(max_entries=64, ttl=3600)
+def create_manufacturer_chart(_df, filter_sig, chart_type, title):
     """
     Create manufacturer-focused charts (top performers or market share)
+    Cached by filter signature; _df is the frame that signature selects
     """
-    manufacturer_data = df.groupby('manufacturer')['registrations'].sum().reset_index()
+    df = _df
+    manufacturer_data = df.groupby('manufacturer', observed=True, sort=False)['registrations'].sum().reset_index()
     manufacturer_data = manufacturer_data.sort_values('registrations', ascending=False).head(10)
+    manufacturer_data['registrations'] = manufacturer_data['registrations'].to_numpy(dtype=np.int32)
     
     if chart_type == "top_performers":
         fig = px.bar(
@@ -84,13 +110,7 @@ def create_manufacturer_chart(df, chart_type, title):
             color_continuous_scale='Blues'
         )
         
-        fig.update_layout(
-            xaxis_tickangle=-45,
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            font=dict(family="Arial, sans-serif", size=12),
-            title_font_size=16
-        )
+        fig.update_layout(**BASE_LAYOUT, xaxis_tickangle=-45)
         
     elif chart_type == "market_share":
         fig = px.pie(
@@ -102,49 +122,40 @@ def create_manufacturer_chart(df, chart_type, title):
         )
         
         fig.update_traces(textposition='inside', textinfo='percent+label')
-        fig.update_layout(
-            font=dict(family="Arial, sans-serif", size=12),
-            title_font_size=16
-        )
+        fig.update_layout(**FONT_LAYOUT)
     
     return fig
 
-def create_growth_indicators(df, title):
+@st.cache_data(max_entries=64, ttl=3600)
+def create_growth_indicators(_df, filter_sig, title):
     """
     Create a chart showing YoY growth indicators by category
+    Cached by filter signature; _df is the frame that signature selects
     """
-    # Calculate YoY growth for each category
-    current_year = df['date'].dt.year.max()
+    df = _df
+    # Calculate YoY growth for each category from a single category x year cross-tab
+    years = df['date'].dt.year
+    current_year = years.max()
     previous_year = current_year - 1
     
-    current_data = df[df['date'].dt.year == current_year].groupby('vehicle_category')['registrations'].sum()
-    previous_data = df[df['date'].dt.year == previous_year].groupby('vehicle_category')['registrations'].sum()
-    
-    growth_data = []
-    for category in current_data.index:
-        if category in previous_data.index and previous_data[category] > 0:
-            growth = ((current_data[category] - previous_data[category]) / previous_data[category]) * 100
-        else:
-            growth = 0
-        
-        growth_data.append({
-            'category': category,
-            'growth': growth,
-            'current': current_data[category],
-            'previous': previous_data.get(category, 0)
-        })
+    pivot = df.pivot_table(
+        index='vehicle_category', columns=years, values='registrations',
+        aggfunc='sum', fill_value=0, observed=True
+    ).reindex(columns=[previous_year, current_year], fill_value=0)
+    pivot = pivot[pivot[current_year] > 0]
     
-    growth_df = pd.DataFrame(growth_data)
+    growth = ((pivot[current_year] - pivot[previous_year]) / pivot[previous_year].replace(0, np.nan) * 100).fillna(0)
     
     # Create bar chart with color coding for positive/negative growth
-    colors = ['#10B981' if x >= 0 else '#EF4444' for x in growth_df['growth']]
+    growth_values = growth.to_numpy(dtype=np.float32)
+    colors = np.where(growth_values >= 0, COLORS['success'], COLORS['error']).tolist()
     
     fig = go.Figure(data=[
         go.Bar(
-            x=growth_df['category'],
-            y=growth_df['growth'],
+            x=growth.index,
+            y=growth_values,
             marker_color=colors,
-            text=[f"{x:.1f}%" for x in growth_df['growth']],
+            text=[f"{x:.1f}%" for x in growth_values],
             textposition='auto',
         )
     ])
@@ -153,10 +164,7 @@ def create_growth_indicators(df, title):
         title=title,
         xaxis_title="Vehicle Category",
         yaxis_title="YoY Growth (%)",
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        font=dict(family="Arial, sans-serif", size=12),
-        title_font_size=16,
+        **BASE_LAYOUT,
         showlegend=False
     )
     
@@ -169,11 +177,11 @@ def create_quarterly_comparison(df, title):
     """
     Create a chart comparing quarterly performance
     """
-    # Extract quarter and year information
-    df['quarter'] = df['date'].dt.quarter
-    df['year_quarter'] = df['date'].dt.year.astype(str) + '-Q' + df['quarter'].astype(str)
+    # Extract quarter and year information without adding columns to the caller's frame
+    year_quarter = df['date'].dt.year.astype(str) + '-Q' + df['date'].dt.quarter.astype(str)
     
-    quarterly_data = df.groupby(['year_quarter', 'vehicle_category'])['registrations'].sum().reset_index()
+    quarterly_data = df.assign(year_quarter=year_quarter).groupby(['year_quarter', 'vehicle_category'], observed=True)['registrations'].sum().reset_index()
+    quarterly_data['registrations'] = quarterly_data['registrations'].to_numpy(dtype=np.int32)
     
     fig = px.bar(
         quarterly_data,
@@ -185,20 +193,7 @@ def create_quarterly_comparison(df, title):
         barmode='group'
     )
     
-    fig.update_layout(
-        xaxis_tickangle=-45,
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        font=dict(family="Arial, sans-serif", size=12),
-        title_font_size=16,
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1
-        )
-    )
+    fig.update_layout(**BASE_LAYOUT, xaxis_tickangle=-45, legend=HORIZONTAL_LEGEND)
     
     return fig
 
@@ -206,8 +201,9 @@ def create_state_wise_analysis(df, title):
     """
     Create a chart showing state-wise registration distribution
     """
-    state_data = df.groupby('state')['registrations'].sum().reset_index()
+    state_data = df.groupby('state', observed=True, sort=False)['registrations'].sum().reset_index()
     state_data = state_data.sort_values('registrations', ascending=True)
+    state_data['registrations'] = state_data['registrations'].to_numpy(dtype=np.int32)
     
     fig = px.bar(
         state_data,
@@ -219,13 +215,7 @@ def create_state_wise_analysis(df, title):
         color_continuous_scale='Viridis'
     )
     
-    fig.update_layout(
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        font=dict(family="Arial, sans-serif", size=12),
-        title_font_size=16,
-        height=400
-    )
+    fig.update_layout(**BASE_LAYOUT, height=400)
     
     return fig
 
@@ -234,9 +224,8 @@ def create_heatmap_analysis(df, title):
     Create a heatmap showing registrations by month and category
     """
     # Create pivot table for heatmap
-    df['month'] = df['date'].dt.month
-    heatmap_data = df.groupby(['month', 'vehicle_category'])['registrations'].sum().reset_index()
-    pivot_data = heatmap_data.pivot(index='month', columns='vehicle_category', values='registrations')
+    heatmap_data = df.assign(month=df['date'].dt.month).groupby(['month', 'vehicle_category'], observed=True)['registrations'].sum().reset_index()
+    pivot_data = heatmap_data.pivot(index='month', columns='vehicle_category', values='registrations').astype(np.float32)
     
     # Month names for better readability
     month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
@@ -250,9 +239,6 @@ def create_heatmap_analysis(df, title):
         aspect='auto'
     )
     
-    fig.update_layout(
-        font=dict(family="Arial, sans-serif", size=12),
-        title_font_size=16
-    )
+    fig.update_layout(**FONT_LAYOUT)
     
     return fig
\ No newline at end of file
@@ -5,16 +5,28 @@ Handles data fetching, cleaning, and preparation for the dashboard
 
 import pandas as pd
 import numpy as np
+import streamlit as st
 from datetime import datetime, timedelta
 import sqlite3
 import os
+from itertools import product
+
+from _growth_numba import growth_kernel
+
+# String columns with few distinct values, stored as pandas categoricals
+CATEGORICAL_COLUMNS = ['vehicle_category', 'manufacturer', 'state', 'vehicle_class', 'rto', 'quarter']
+
+# Index of the loaded frame, sorted so date ranges resolve by binary search
+INDEX_COLUMNS = ['date', 'vehicle_category', 'manufacturer']
+
+PARQUET_PATH = 'data/processed_vehicle_data.parquet'
 
 def generate_mock_data():
     """
     Generate realistic mock data based on Indian vehicle registration patterns
     This simulates data that would be scraped from Vahan Dashboard
     """
-    np.random.seed(42)  # For reproducible results
+    rng = np.random.default_rng(42)  # For reproducible results
     
     # Define realistic data parameters
     manufacturers = {
@@ -30,120 +42,214 @@ def generate_mock_data():
         '4W': ['MOTOR CAR', 'SUV', 'COMMERCIAL VEHICLE', 'BUS']
     }
     
-    data = []
-    
-    # Generate data for last 3 years with realistic patterns
-    for year in range(2022, 2025):
-        for month in range(1, 13):
-            for category in ['2W', '3W', '4W']:
-                for manufacturer in manufacturers[category]:
-                    for state in states[:5]:  # Limit states for demo
-                        # Seasonal multiplier - higher sales in Q3 and Q4 (festival season)
-                        seasonal_multiplier = 1.3 if month >= 7 and month <= 12 else 0.9
-                        
-                        # Base registrations with realistic proportions
-                        base_registrations = {
-                            '2W': np.random.randint(5000, 20000),
-                            '3W': np.random.randint(500, 3000),
-                            '4W': np.random.randint(2000, 10000)
-                        }
-                        
-                        # Market share adjustments
-                        market_share_multiplier = 1.4 if manufacturer in ['Hero MotoCorp', 'Maruti Suzuki'] else \
-                                                 1.2 if manufacturer in ['Honda', 'Hyundai'] else 1.0
-                        
-                        # Year-over-year growth
-                        yoy_multiplier = 1.15 if year == 2024 else (1.08 if year == 2023 else 1.0)
-                        
-                        registrations = int(
-                            base_registrations[category] * 
-                            seasonal_multiplier * 
-                            market_share_multiplier * 
-                            yoy_multiplier *
-                            np.random.uniform(0.8, 1.2)  # Add some randomness
-                        )
-                        
-                        quarter = f"Q{(month-1)//3 + 1}"
-                        date = f"{year}-{month:02d}-01"
-                        
-                        data.append({
-                            'date': date,
-                            'vehicle_category': category,
-                            'vehicle_class': np.random.choice(vehicle_classes[category]),
-                            'manufacturer': manufacturer,
-                            'state': state,
-                            'rto': f"{state[:2].upper()}{np.random.randint(1, 99):02d}",
-                            'registrations': registrations,
-                            'quarter': f"{year}-{quarter}",
-                            'year': year
-                        })
-    
-    return pd.DataFrame(data)
+    base_ranges = {'2W': (5000, 20000), '3W': (500, 3000), '4W': (2000, 10000)}
+    market_share_multipliers = {'Hero MotoCorp': 1.4, 'Maruti Suzuki': 1.4, 'Honda': 1.2, 'Hyundai': 1.2}
+    yoy_multipliers = {2022: 1.0, 2023: 1.08, 2024: 1.15}
+    
+    # One row per (year, month, category/manufacturer, state), in the same order as a nested loop
+    categories = ['2W', '3W', '4W']
+    pairs = [(category, manufacturer) for category in categories for manufacturer in manufacturers[category]]
+    years = np.arange(2022, 2025)
+    demo_states = states[:5]  # Limit states for demo
+    combos = np.array(list(product(range(len(years)), range(12), range(len(pairs)), range(len(demo_states)))))
+    n = len(combos)
+    
+    year = years[combos[:, 0]]
+    month = combos[:, 1] + 1
+    cat_idx = np.array([categories.index(category) for category, _ in pairs])[combos[:, 2]]
+    manufacturer = np.array([m for _, m in pairs])[combos[:, 2]]
+    state = np.array(demo_states)[combos[:, 3]]
+    
+    # Seasonal multiplier - higher sales in Q3 and Q4 (festival season)
+    seasonal_multiplier = np.where(month >= 7, 1.3, 0.9)
+    
+    # Base registrations with realistic proportions
+    low = np.array([base_ranges[c][0] for c in categories])[cat_idx]
+    high = np.array([base_ranges[c][1] for c in categories])[cat_idx]
+    base_registrations = rng.integers(low, high)
+    
+    # Market share adjustments
+    pair_share = np.array([market_share_multipliers.get(m, 1.0) for _, m in pairs])
+    market_share_multiplier = pair_share[combos[:, 2]]
+    
+    # Year-over-year growth
+    yoy_multiplier = np.array([yoy_multipliers[y] for y in years])[combos[:, 0]]
+    
+    registrations = (
+        base_registrations *
+        seasonal_multiplier *
+        market_share_multiplier *
+        yoy_multiplier *
+        rng.uniform(0.8, 1.2, n)  # Add some randomness
+    ).astype(np.int32)
+    
+    # Pick a vehicle class per row from its category's class list
+    class_counts = np.array([len(vehicle_classes[c]) for c in categories])
+    class_table = np.array([vehicle_classes[c] + [''] * (class_counts.max() - len(vehicle_classes[c])) for c in categories])
+    class_idx = (rng.random(n) * class_counts[cat_idx]).astype(np.int64)
+    
+    rto_prefix = pd.Series([s[:2].upper() for s in demo_states])[combos[:, 3]].to_numpy()
+    rto_number = pd.Series(rng.integers(1, 99, n)).astype(str).str.zfill(2).to_numpy()
+    quarter = pd.Series(year).astype(str).to_numpy() + '-Q' + pd.Series((month - 1) // 3 + 1).astype(str).to_numpy()
+    
+    return pd.DataFrame({
+        'date': pd.to_datetime(pd.DataFrame({'year': year, 'month': month, 'day': 1})),
+        'vehicle_category': np.array(categories)[cat_idx],
+        'vehicle_class': class_table[cat_idx, class_idx],
+        'manufacturer': manufacturer,
+        'state': state,
+        'rto': rto_prefix + rto_number,
+        'registrations': registrations,
+        'quarter': quarter,
+        'year': year
+    })
+
+def prepare_dataframe(df):
+    """
+    Normalize dtypes once at ingest: parsed dates, categorical string columns
+    and compact integer columns
+    """
+    df['date'] = pd.to_datetime(df['date'])
+    
+    # Store low-cardinality strings as categoricals and downcast numerics
+    for col in CATEGORICAL_COLUMNS:
+        df[col] = df[col].astype('category')
+    df['registrations'] = df['registrations'].astype(np.int32)
+    df['year'] = pd.to_numeric(df['year'], downcast='integer')
+    
+    # Date parts used by the analytics helpers, computed once instead of per call
+    df['_year'] = df['date'].dt.year.astype('int16')
+    df['_month'] = df['date'].dt.month.astype('int8')
+    df['_quarter'] = df['date'].dt.quarter.astype('int8')
+    
+    # Source row position, so filter_data can return rows in their original order
+    df['_row'] = np.arange(len(df), dtype=np.int32)
+    
+    return df
 
+@st.cache_data(ttl=3600)
 def load_and_process_data():
     """
     Load and process vehicle registration data
     In production, this would connect to the actual Vahan API or database
+    Cached across reruns and sessions so filter changes skip disk I/O
+    
+    The returned frame is indexed by a sorted (date, vehicle_category, manufacturer)
+    MultiIndex so filter_data can select by index instead of boolean masks
     """
     try:
-        # Check if processed data exists
-        if os.path.exists('data/processed_vehicle_data.csv'):
-            df = pd.read_csv('data/processed_vehicle_data.csv')
-            df['date'] = pd.to_datetime(df['date'])
+        # Parquet keeps datetime and category dtypes, so no re-parsing is needed;
+        # memory mapping lets concurrent workers share the file's pages
+        if os.path.exists(PARQUET_PATH):
+            df = pd.read_parquet(PARQUET_PATH, engine='pyarrow', memory_map=True)
         else:
-            # Generate mock data (in production, this would be actual data scraping)
-            df = generate_mock_data()
-            df['date'] = pd.to_datetime(df['date'])
+            if os.path.exists('data/processed_vehicle_data.csv'):
+                # Legacy CSV export, migrated to Parquet below
+                df = pd.read_csv('data/processed_vehicle_data.csv')
+            else:
+                # Generate mock data (in production, this would be actual data scraping)
+                df = generate_mock_data()
+            df = prepare_dataframe(df)
             
             # Create data directory and save processed data
             os.makedirs('data', exist_ok=True)
-            df.to_csv('data/processed_vehicle_data.csv', index=False)
+            df.to_parquet(PARQUET_PATH, engine='pyarrow', compression='zstd', index=False)
         
-        return df
+        # Data version for cache keys downstream; changes whenever the Parquet file is rewritten
+        df.attrs['version'] = os.stat(PARQUET_PATH).st_mtime_ns
+        # Column layout before indexing, restored by filter_data and save_to_database
+        df.attrs['columns'] = list(df.columns)
+        
+        return df.set_index(INDEX_COLUMNS).sort_index()
     
     except Exception as e:
         print(f"Error loading data: {e}")
         return pd.DataFrame()
 
+@st.cache_data(ttl=3600)
+def load_monthly_aggregates(data_version):
+    """
+    Pre-aggregate registrations into a monthly rollup for the charts
+    Built from load_and_process_data on a cache miss and keyed by its data
+    version, so reruns look it up without hashing the raw frame; it keeps the
+    (date, vehicle_category, manufacturer) index so it can be passed to
+    filter_data like the raw frame
+    """
+    flat = load_and_process_data().reset_index()
+    return flat.groupby(
+        [pd.Grouper(key='date', freq='MS'), 'vehicle_category', 'manufacturer'], observed=True
+    )[['registrations']].sum()
+
+def filter_data(df, start_date, end_date, categories, manufacturers=None):
+    """
+    Select rows of the indexed frame from load_and_process_data by date range,
+    categories and (optionally) manufacturers, returning a flat frame in the
+    source row order and column layout
+    """
+    key = (slice(pd.Timestamp(start_date), pd.Timestamp(end_date)), list(categories),
+           list(manufacturers) if manufacturers else slice(None))
+    try:
+        filtered = df.loc[key, :]
+    except KeyError:
+        # MultiIndex selection raises when nothing matches
+        filtered = df.iloc[:0]
+    flat = filtered.reset_index()
+    if '_row' in flat.columns:
+        # Back to the source row order and column layout of the unindexed frame
+        flat = flat.sort_values('_row', ignore_index=True)[df.attrs['columns']]
+    return flat
+
+@st.cache_data
 def get_growth_metrics(df):
     """
     Calculate YoY and QoQ growth metrics for different vehicle categories
+    Cached by the content of the filtered frame
     """
     current_date = df['date'].max()
     previous_year_date = current_date - timedelta(days=365)
     previous_quarter_date = current_date - timedelta(days=90)
     
     # Current period data
-    current_data = df[df['date'] >= previous_quarter_date]
+    cur_start = previous_quarter_date
     
     # Previous year same period
     prev_year_start = previous_year_date - timedelta(days=90)
-    prev_year_data = df[(df['date'] >= prev_year_start) & (df['date'] < previous_year_date)]
     
     # Previous quarter data
     prev_quarter_start = previous_quarter_date - timedelta(days=90)
-    prev_quarter_data = df[(df['date'] >= prev_quarter_start) & (df['date'] < previous_quarter_date)]
     
     def calculate_growth(current, previous):
         if previous == 0:
             return 0
         return ((current - previous) / previous) * 100
     
+    # Sum every (category, window) pair in a single pass over the data
+    categories = df['vehicle_category'].astype('category')
+    totals = growth_kernel(
+        df['date'].to_numpy(dtype='datetime64[ns]').view(np.int64),
+        categories.cat.codes.to_numpy(),
+        df['registrations'].to_numpy(),  # int32 at load; the kernel accumulates in int64
+        len(categories.cat.categories),
+        pd.Timestamp(cur_start).value, np.iinfo(np.int64).max,
+        pd.Timestamp(prev_year_start).value, pd.Timestamp(previous_year_date).value,
+        pd.Timestamp(prev_quarter_start).value, pd.Timestamp(previous_quarter_date).value
+    )
+    category_index = {category: i for i, category in enumerate(categories.cat.categories)}
+    
     # Calculate metrics for each category
     metrics = {}
     
     for category in ['2W', '3W', '4W']:
-        current_total = current_data[current_data['vehicle_category'] == category]['registrations'].sum()
-        prev_year_total = prev_year_data[prev_year_data['vehicle_category'] == category]['registrations'].sum()
-        prev_quarter_total = prev_quarter_data[prev_quarter_data['vehicle_category'] == category]['registrations'].sum()
+        if category in category_index:
+            current_total, prev_year_total, prev_quarter_total = totals[category_index[category]]
+        else:
+            current_total = prev_year_total = prev_quarter_total = 0
         
         metrics[f'{category.lower()}_yoy_growth'] = calculate_growth(current_total, prev_year_total)
         metrics[f'{category.lower()}_qoq_growth'] = calculate_growth(current_total, prev_quarter_total)
     
     # Total metrics
-    current_total = current_data['registrations'].sum()
-    prev_year_total = prev_year_data['registrations'].sum()
-    prev_quarter_total = prev_quarter_data['registrations'].sum()
+    current_total, prev_year_total, prev_quarter_total = totals.sum(axis=0)
     
     metrics['total_yoy_growth'] = calculate_growth(current_total, prev_year_total)
     metrics['total_qoq_growth'] = calculate_growth(current_total, prev_quarter_total)
@@ -156,8 +262,22 @@ def save_to_database(df, db_path='data/vehicle_registrations.db'):
     """
     try:
         os.makedirs('data', exist_ok=True)
+        if any(name is not None for name in df.index.names):
+            df = df.reset_index()
+        # Source column layout; derived helper columns (prefixed with '_') are not stored
+        columns = df.attrs.get('columns', list(df.columns))
+        df = df[[c for c in columns if not str(c).startswith('_')]]
         conn = sqlite3.connect(db_path)
-        df.to_sql('registrations', conn, if_exists='replace', index=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        # Multi-row INSERTs, sized to stay under SQLite's 999 bound-variable limit
+        df.to_sql('registrations', conn, if_exists='replace', index=False,
+                  method='multi', chunksize=max(1, 999 // len(df.columns)))
+        conn.executescript("""
+            CREATE INDEX IF NOT EXISTS idx_date ON registrations(date);
+            CREATE INDEX IF NOT EXISTS idx_cat_man ON registrations(vehicle_category, manufacturer);
+            CREATE INDEX IF NOT EXISTS idx_state ON registrations(state);
+        """)
         conn.close()
         print(f"Data saved to database: {db_path}")
     except Exception as e:
@@ -6,8 +6,6 @@ Description: Interactive dashboard for vehicle registration data analysis
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import sys
 import os
@@ -15,9 +13,9 @@ import os
 # Add current directory to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from data_loader import load_and_process_data, get_growth_metrics
+from data_loader import load_and_process_data, load_monthly_aggregates, filter_data, get_growth_metrics
 from charts import create_trend_chart, create_manufacturer_chart, create_growth_indicators
-from utils import format_number, calculate_percentage_change, get_date_range_options
+from utils import format_number, calculate_percentage_change, get_date_range_options, df_to_csv_bytes
 
 # Page configuration
 st.set_page_config(
@@ -107,9 +105,13 @@ def main():
             max_value=date_options['max_date']
         )
     
+    # Convert once; reused by the filters, the cache key and the export file names
+    start_ts = pd.Timestamp(start_date)
+    end_ts = pd.Timestamp(end_date)
+    
     # Vehicle category filter
     st.sidebar.markdown("### 🏍️ Vehicle Categories")
-    available_categories = sorted(df['vehicle_category'].unique())
+    available_categories = sorted(df.index.get_level_values('vehicle_category').unique())
     selected_categories = st.sidebar.multiselect(
         "Select Categories",
         available_categories,
@@ -118,7 +120,7 @@ def main():
     
     # Manufacturer filter
     st.sidebar.markdown("### 🏭 Manufacturers")
-    available_manufacturers = sorted(df['manufacturer'].unique())
+    available_manufacturers = sorted(df.index.get_level_values('manufacturer').unique())
     selected_manufacturers = st.sidebar.multiselect(
         "Select Manufacturers (Top 10 shown)",
         available_manufacturers[:10],
@@ -126,22 +128,30 @@ def main():
     )
     
     # Filter data based on selections
-    filtered_df = df[
-        (df['date'] >= pd.to_datetime(start_date)) &
-        (df['date'] <= pd.to_datetime(end_date)) &
-        (df['vehicle_category'].isin(selected_categories)) &
-        (df['manufacturer'].isin(selected_manufacturers) if selected_manufacturers else True)
-    ]
+    filtered_df = filter_data(df, start_ts, end_ts, selected_categories, selected_manufacturers)
     
     if filtered_df.empty:
         st.warning("No data available for the selected filters. Please adjust your selection.")
         return
     
+    # Version of the loaded data, so cached rollups, charts and exports are rebuilt after a data refresh
+    data_version = df.attrs.get('version')
+    
+    # Charts only need monthly totals, so they read the much smaller pre-aggregated frame
+    monthly_df = filter_data(load_monthly_aggregates(data_version), start_ts, end_ts, selected_categories, selected_manufacturers)
+    
+    # Cheap cache key for the chart builders and the export (the filtered frame itself is not hashed)
+    filter_sig = (data_version, start_ts, end_ts, tuple(sorted(selected_categories)), tuple(sorted(selected_manufacturers)))
+    
     # Key Metrics Section
     st.markdown('<h2 class="section-header">📈 Overall Vehicle Registration Trends</h2>', unsafe_allow_html=True)
     
-    # Calculate key metrics
-    total_registrations = filtered_df['registrations'].sum()
+    # Calculate key metrics (one groupby gives every category total)
+    cat_totals = filtered_df.groupby('vehicle_category', observed=True, sort=False)['registrations'].sum()
+    two_wheeler_total = cat_totals.get('2W', 0)
+    three_wheeler_total = cat_totals.get('3W', 0)
+    four_wheeler_total = cat_totals.get('4W', 0)
+    total_registrations = cat_totals.sum()
     growth_metrics = get_growth_metrics(filtered_df)
     
     # Display metrics in columns
@@ -155,7 +165,6 @@ def main():
         )
     
     with col2:
-        two_wheeler_total = filtered_df[filtered_df['vehicle_category'] == '2W']['registrations'].sum()
         st.metric(
             label="2W Registrations",
             value=format_number(two_wheeler_total),
@@ -163,7 +172,6 @@ def main():
         )
     
     with col3:
-        four_wheeler_total = filtered_df[filtered_df['vehicle_category'] == '4W']['registrations'].sum()
         st.metric(
             label="4W Registrations",
             value=format_number(four_wheeler_total),
@@ -171,7 +179,6 @@ def main():
         )
     
     with col4:
-        three_wheeler_total = filtered_df[filtered_df['vehicle_category'] == '3W']['registrations'].sum()
         st.metric(
             label="3W Registrations",
             value=format_number(three_wheeler_total),
@@ -183,13 +190,13 @@ def main():
     
     with col1:
         st.plotly_chart(
-            create_trend_chart(filtered_df, "Monthly Registration Trends"),
+            create_trend_chart(monthly_df, filter_sig, "Registration Trends"),
             use_container_width=True
         )
     
     with col2:
         st.plotly_chart(
-            create_growth_indicators(filtered_df, "YoY Growth by Category"),
+            create_growth_indicators(monthly_df, filter_sig, "YoY Growth by Category"),
             use_container_width=True
         )
     
@@ -200,13 +207,13 @@ def main():
     
     with col1:
         st.plotly_chart(
-            create_manufacturer_chart(filtered_df, "top_performers", "Top Performing Manufacturers"),
+            create_manufacturer_chart(monthly_df, filter_sig, "top_performers", "Top Performing Manufacturers"),
             use_container_width=True
         )
     
     with col2:
         st.plotly_chart(
-            create_manufacturer_chart(filtered_df, "market_share", "Market Share Distribution"),
+            create_manufacturer_chart(monthly_df, filter_sig, "market_share", "Market Share Distribution"),
             use_container_width=True
         )
     
@@ -244,10 +251,11 @@ def main():
     fastest_growing = max(growth_metrics['2w_yoy_growth'], growth_metrics['3w_yoy_growth'], growth_metrics['4w_yoy_growth'])
     fastest_category = '2W' if fastest_growing == growth_metrics['2w_yoy_growth'] else ('3W' if fastest_growing == growth_metrics['3w_yoy_growth'] else '4W')
     
-    top_manufacturer = filtered_df.groupby('manufacturer')['registrations'].sum().idxmax()
-    top_manufacturer_share = (filtered_df[filtered_df['manufacturer'] == top_manufacturer]['registrations'].sum() / total_registrations) * 100
+    manufacturer_totals = filtered_df.groupby('manufacturer', observed=True, sort=False)['registrations'].sum()
+    top_manufacturer = manufacturer_totals.idxmax()
+    top_manufacturer_share = (manufacturer_totals.max() / total_registrations) * 100
     
-    seasonal_analysis = filtered_df.groupby(filtered_df['date'].dt.month)['registrations'].mean()
+    seasonal_analysis = filtered_df.groupby(filtered_df['date'].dt.month, observed=True)['registrations'].mean()
     peak_month = seasonal_analysis.idxmax()
     peak_month_name = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'][peak_month-1]
     
@@ -270,22 +278,22 @@ def main():
     
     col1, col2 = st.columns(2)
     with col1:
-        csv = filtered_df.to_csv(index=False)
         st.download_button(
             label="📊 Download Filtered Data (CSV)",
-            data=csv,
-            file_name=f"vehicle_registration_data_{start_date}_{end_date}.csv",
+            data=df_to_csv_bytes(filter_sig, filtered_df),
+            file_name=f"vehicle_registration_data_{start_ts.date()}_{end_ts.date()}.csv",
             mime="text/csv"
         )
     
     with col2:
+        cat_share = cat_totals / total_registrations * 100
         summary_data = {
             'Metric': ['Total Registrations', '2W Share', '3W Share', '4W Share', 'Top Manufacturer'],
             'Value': [
                 format_number(total_registrations),
-                f"{(two_wheeler_total/total_registrations)*100:.1f}%",
-                f"{(three_wheeler_total/total_registrations)*100:.1f}%",
-                f"{(four_wheeler_total/total_registrations)*100:.1f}%",
+                f"{cat_share.get('2W', 0):.1f}%",
+                f"{cat_share.get('3W', 0):.1f}%",
+                f"{cat_share.get('4W', 0):.1f}%",
                 top_manufacturer
             ]
         }
@@ -293,7 +301,7 @@ def main():
         st.download_button(
             label="📈 Download Summary Report (CSV)",
             data=summary_csv,
-            file_name=f"vehicle_summary_{start_date}_{end_date}.csv",
+            file_name=f"vehicle_summary_{start_ts.date()}_{end_ts.date()}.csv",
             mime="text/csv"
         )
     
@@ -3,40 +3,94 @@ Utility Functions Module
 Helper functions for data processing and formatting
 """
 
+import io
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import streamlit as st
 from datetime import datetime, timedelta
 
+from _growth_numba import group_period_sum
+
+# Indian numbering system magnitudes: Thousand, Lakh, Crore
+_MAGNITUDE_BINS = np.array([1e3, 1e5, 1e7])
+_MAGNITUDE_DIVISORS = np.array([1.0, 1e3, 1e5, 1e7])
+_MAGNITUDE_SUFFIXES = np.array(['', 'K', 'L', 'Cr'])
+
+def format_number_series(s):
+    """
+    Format a Series of numbers in Indian numbering system (Lakhs, Crores)
+    Magnitude buckets are picked for the whole Series in one vectorized pass
+    """
+    s = pd.Series(s)
+    values = pd.to_numeric(s, errors='coerce').to_numpy(dtype=np.float64)
+    idx = np.digitize(np.abs(values), _MAGNITUDE_BINS)
+    scaled = values / _MAGNITUDE_DIVISORS[idx]
+    is_zero = np.isnan(values) | (values == 0)
+    
+    formatted = [
+        "0" if zero else (f"{v:.1f}{suffix}" if i else f"{v:,.0f}")
+        for v, i, suffix, zero in zip(scaled, idx, _MAGNITUDE_SUFFIXES[idx], is_zero)
+    ]
+    return pd.Series(formatted, index=s.index)
+
 def format_number(num):
     """
     Format numbers in Indian numbering system (Lakhs, Crores)
+    The magnitude is looked up with searchsorted instead of an if/elif ladder
     """
     if pd.isna(num) or num == 0:
         return "0"
     
-    if abs(num) >= 10000000:  # 1 Crore
-        return f"{num/10000000:.1f}Cr"
-    elif abs(num) >= 100000:  # 1 Lakh
-        return f"{num/100000:.1f}L"
-    elif abs(num) >= 1000:  # 1 Thousand
-        return f"{num/1000:.1f}K"
-    else:
-        return f"{num:,.0f}"
+    i = int(_MAGNITUDE_BINS.searchsorted(abs(num), side='right'))
+    return f"{num / _MAGNITUDE_DIVISORS[i]:.1f}{_MAGNITUDE_SUFFIXES[i]}" if i else f"{num:,.0f}"
+
+def pct_change(current, previous):
+    """
+    Element-wise percentage change between two arrays
+    A zero previous value gives 0 when current is also zero, otherwise 100
+    """
+    current = np.asarray(current, dtype=np.float64)
+    previous = np.asarray(previous, dtype=np.float64)
+    zero = previous == 0
+    change = (current - previous) / np.where(zero, 1.0, previous) * 100
+    return np.where(zero, np.where(current == 0, 0.0, 100.0), change)
 
 def calculate_percentage_change(current, previous):
     """
     Calculate percentage change between two values
     """
-    if previous == 0:
-        return 0 if current == 0 else 100
-    return ((current - previous) / previous) * 100
+    return float(pct_change(current, previous))
+
+@st.cache_data(max_entries=8)
+def df_to_csv_bytes(df_sig, _df):
+    """
+    Serialize a DataFrame to CSV bytes, cached by a caller-supplied signature
+    so the export is only rebuilt when the selection or data behind it changes
+    """
+    buf = io.BytesIO()
+    # Derived helper columns (prefixed with '_') are left out of the export
+    columns = [c for c in _df.columns if not str(c).startswith('_')]
+    _df.to_csv(buf, columns=columns, index=False, lineterminator='\n')
+    return buf.getvalue()
+
+def _date_part(df, part):
+    """
+    Return the precomputed _year/_month/_quarter column from prepare_dataframe,
+    falling back to the date accessor for frames that lack it
+    """
+    column = f'_{part}'
+    if column in df.columns:
+        return df[column]
+    return getattr(df['date'].dt, part)
 
 def get_date_range_options(df):
     """
     Get available date range options from the dataset
     """
-    min_date = df['date'].min().date()
-    max_date = df['date'].max().date()
+    dates = df.index.get_level_values('date') if 'date' in df.index.names else df['date']
+    min_date = dates.min().date()
+    max_date = dates.max().date()
     
     return {
         'min_date': min_date,
@@ -45,150 +99,185 @@ def get_date_range_options(df):
         'default_end': max_date
     }
 
+@st.cache_data(show_spinner=False, max_entries=8)
 def calculate_market_share(df, group_by='manufacturer'):
     """
     Calculate market share for manufacturers or categories
     """
-    total_registrations = df['registrations'].sum()
-    
     if group_by == 'manufacturer':
-        market_share = df.groupby('manufacturer')['registrations'].sum()
+        market_share = df.groupby('manufacturer', observed=True, sort=False)['registrations'].sum()
     elif group_by == 'category':
-        market_share = df.groupby('vehicle_category')['registrations'].sum()
+        market_share = df.groupby('vehicle_category', observed=True, sort=False)['registrations'].sum()
     else:
-        market_share = df.groupby(group_by)['registrations'].sum()
+        market_share = df.groupby(group_by, observed=True, sort=False)['registrations'].sum()
+    
+    # Total from the group sums (like SUM(SUM(x)) OVER ()), not another pass over the rows
+    total_registrations = market_share.sum()
     
-    market_share_pct = (market_share / total_registrations * 100).round(2)
+    # float32 is ample for percentages that are displayed to one decimal
+    market_share_pct = pd.Series(
+        market_share.to_numpy(dtype=np.float32) * np.float32(100.0 / total_registrations),
+        index=market_share.index, name=market_share.name
+    )
     
     return market_share_pct.sort_values(ascending=False)
 
+@st.cache_data(show_spinner=False, max_entries=8)
 def get_seasonal_patterns(df):
     """
     Analyze seasonal patterns in vehicle registrations
     """
-    df['month'] = df['date'].dt.month
-    monthly_avg = df.groupby('month')['registrations'].mean()
+    # Per-month sums and counts in two bincount passes (months with no rows become NaN)
+    month_idx = _date_part(df, 'month').to_numpy().astype(np.intp) - 1
+    sums = np.bincount(month_idx, weights=df['registrations'].to_numpy(), minlength=12)
+    counts = np.bincount(month_idx, minlength=12)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        monthly_avg = sums / counts
     
     # Calculate seasonal index (average month / overall average)
-    overall_avg = monthly_avg.mean()
-    seasonal_index = (monthly_avg / overall_avg * 100).round(1)
+    overall_avg = np.nanmean(monthly_avg)
+    seasonal_index = np.round(monthly_avg / overall_avg * 100, 1)
     
     month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
                    'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
     
     seasonal_data = pd.DataFrame({
         'Month': month_names,
-        'Average_Registrations': monthly_avg.values,
-        'Seasonal_Index': seasonal_index.values
+        'Average_Registrations': monthly_avg,
+        'Seasonal_Index': seasonal_index
     })
     
     return seasonal_data
 
+@st.cache_data(show_spinner=False, max_entries=8)
 def identify_growth_leaders(df, period='YoY'):
     """
     Identify growth leaders by manufacturer and category
     """
-    current_year = df['date'].dt.year.max()
+    # Masks are built on the raw int16/int8 arrays; no filtered DataFrame copies are made
+    years = _date_part(df, 'year').to_numpy()
+    current_year = years.max()
     
     if period == 'YoY':
-        current_data = df[df['date'].dt.year == current_year]
-        previous_data = df[df['date'].dt.year == (current_year - 1)]
+        current_mask = years == current_year
+        previous_mask = years == (current_year - 1)
     elif period == 'QoQ':
-        current_quarter = df['date'].dt.quarter.max()
-        current_data = df[(df['date'].dt.year == current_year) & 
-                         (df['date'].dt.quarter == current_quarter)]
-        previous_data = df[(df['date'].dt.year == current_year) & 
-                          (df['date'].dt.quarter == (current_quarter - 1))]
-    
-    growth_leaders = []
-    
-    # Manufacturer-wise growth
-    for manufacturer in df['manufacturer'].unique():
-        current_total = current_data[current_data['manufacturer'] == manufacturer]['registrations'].sum()
-        previous_total = previous_data[previous_data['manufacturer'] == manufacturer]['registrations'].sum()
-        
-        if previous_total > 0:
-            growth_rate = calculate_percentage_change(current_total, previous_total)
-            growth_leaders.append({
-                'Type': 'Manufacturer',
-                'Name': manufacturer,
-                'Current': current_total,
-                'Previous': previous_total,
-                'Growth_Rate': growth_rate
-            })
-    
-    # Category-wise growth
-    for category in df['vehicle_category'].unique():
-        current_total = current_data[current_data['vehicle_category'] == category]['registrations'].sum()
-        previous_total = previous_data[previous_data['vehicle_category'] == category]['registrations'].sum()
-        
-        if previous_total > 0:
-            growth_rate = calculate_percentage_change(current_total, previous_total)
-            growth_leaders.append({
-                'Type': 'Category',
-                'Name': category,
-                'Current': current_total,
-                'Previous': previous_total,
-                'Growth_Rate': growth_rate
-            })
-    
-    growth_df = pd.DataFrame(growth_leaders)
+        quarters = _date_part(df, 'quarter').to_numpy()
+        current_quarter = quarters.max()
+        current_mask = (years == current_year) & (quarters == current_quarter)
+        previous_mask = (years == current_year) & (quarters == (current_quarter - 1))
+    
+    # Tag each row with its period, then sum both entity types and both periods in one kernel pass
+    periods = np.full(len(df), -1, dtype=np.int8)
+    periods[previous_mask] = 1
+    periods[current_mask] = 0
+    
+    entity_types = [('manufacturer', 'Manufacturer'), ('vehicle_category', 'Category')]
+    names, types, codes = [], [], []
+    n_groups = 0
+    for column, entity_type in entity_types:
+        series = df[column]
+        categories = (series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype('category')).cat
+        entity_codes = categories.codes.to_numpy().astype(np.int64)
+        codes.append(np.where(entity_codes >= 0, entity_codes + n_groups, -1))
+        names.append(categories.categories.to_numpy(dtype=object))
+        types.append(np.full(len(categories.categories), entity_type, dtype=object))
+        n_groups += len(categories.categories)
+    
+    sums = group_period_sum(np.vstack(codes), periods, df['registrations'].to_numpy(), n_groups)
+    
+    # Manufacturer-wise and category-wise growth, built from typed column arrays in one constructor call
+    current, previous = sums[:, 0], sums[:, 1]
+    keep = previous > 0
+    growth_df = pd.DataFrame({
+        'Type': np.concatenate(types)[keep],
+        'Name': np.concatenate(names)[keep],
+        'Current': current[keep],
+        'Previous': previous[keep],
+        'Growth_Rate': pct_change(current[keep], previous[keep])
+    })
     return growth_df.sort_values('Growth_Rate', ascending=False)
 
+def _present_values(series):
+    """
+    Distinct values of a column; categoricals are counted from their integer
+    codes so unused categories left over from filtering are skipped
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        counts = np.bincount(codes[codes >= 0], minlength=len(series.cat.categories))
+        return series.cat.categories[counts > 0]
+    return series.dropna().unique()
+
+@st.cache_data(show_spinner=False, max_entries=8)
 def validate_data_quality(df):
     """
     Validate data quality and return quality metrics
     """
+    # Derived helper columns (prefixed with '_') are not part of the data being validated
+    columns = [c for c in df.columns if not str(c).startswith('_')]
+    
+    # Arrow tracks null counts per column and hashes duplicate rows in its own grouper
+    table = pa.Table.from_pandas(df, columns=columns, preserve_index=False)
+    total_null = sum(column.null_count for column in table.columns)
+    duplicate_records = table.num_rows - table.group_by(table.column_names).aggregate([]).num_rows
+    date_min, date_max = df['date'].agg(['min', 'max'])
+    
     quality_metrics = {
         'total_records': len(df),
-        'missing_values': df.isnull().sum().sum(),
-        'duplicate_records': df.duplicated().sum(),
-        'date_range': f"{df['date'].min().strftime('%Y-%m-%d')} to {df['date'].max().strftime('%Y-%m-%d')}",
-        'unique_manufacturers': df['manufacturer'].nunique(),
-        'unique_states': df['state'].nunique(),
-        'categories_covered': list(df['vehicle_category'].unique()),
-        'data_completeness': f"{((len(df) - df.isnull().sum().sum()) / (len(df) * len(df.columns)) * 100):.1f}%"
+        'missing_values': total_null,
+        'duplicate_records': duplicate_records,
+        'date_range': f"{date_min.strftime('%Y-%m-%d')} to {date_max.strftime('%Y-%m-%d')}",
+        'unique_manufacturers': len(_present_values(df['manufacturer'])),
+        'unique_states': len(_present_values(df['state'])),
+        'categories_covered': list(_present_values(df['vehicle_category'])),
+        'data_completeness': f"{((len(df) - total_null) / (len(df) * len(columns)) * 100):.1f}%"
     }
     
     return quality_metrics
 
-def export_insights_summary(df, filename='insights_summary.txt'):
+def export_insights_summary(df, filename='insights_summary.txt', *, market_share_mfr=None,
+                            market_share_cat=None, growth_leaders=None, seasonal=None):
     """
     Export key insights to a text file for reporting
+    Results the caller already computed can be passed in and are not recomputed
     """
     insights = []
     
     # Market share insights
-    market_share = calculate_market_share(df, 'manufacturer')
+    market_share = market_share_mfr if market_share_mfr is not None else calculate_market_share(df, 'manufacturer')
     top_manufacturer = market_share.index[0]
     top_share = market_share.iloc[0]
     
     insights.append(f"Market Leadership: {top_manufacturer} leads with {top_share:.1f}% market share")
     
     # Growth insights
-    growth_leaders = identify_growth_leaders(df, 'YoY')
+    if growth_leaders is None:
+        growth_leaders = identify_growth_leaders(df, 'YoY')
     fastest_growing = growth_leaders.iloc[0]
     
     insights.append(f"Fastest Growing: {fastest_growing['Name']} ({fastest_growing['Type']}) with {fastest_growing['Growth_Rate']:.1f}% YoY growth")
     
     # Seasonal insights
-    seasonal_data = get_seasonal_patterns(df)
+    seasonal_data = seasonal if seasonal is not None else get_seasonal_patterns(df)
     peak_month = seasonal_data.loc[seasonal_data['Seasonal_Index'].idxmax(), 'Month']
     
     insights.append(f"Peak Season: {peak_month} shows highest registration activity")
     
     # Category insights
-    category_share = calculate_market_share(df, 'category')
+    category_share = market_share_cat if market_share_cat is not None else calculate_market_share(df, 'category')
     dominant_category = category_share.index[0]
     
     insights.append(f"Dominant Category: {dominant_category} accounts for {category_share.iloc[0]:.1f}% of total registrations")
     
-    # Write to file
-    with open(filename, 'w') as f:
-        f.write("Vehicle Registration Dashboard - Key Insights Summary\n")
-        f.write("=" * 60 + "\n\n")
-        for insight in insights:
-            f.write(f"• {insight}\n")
-        f.write(f"\nGenerated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    # Build the whole report first, then write it as UTF-8 bytes in one call
+    payload = (
+        "Vehicle Registration Dashboard - Key Insights Summary\n"
+        + "=" * 60 + "\n\n"
+        + "".join(f"• {insight}\n" for insight in insights)
+        + f"\nGenerated on: {datetime.now():%Y-%m-%d %H:%M:%S}\n"
+    )
+    with open(filename, 'wb') as f:
+        f.write(payload.encode('utf-8'))
     
     return insights
\ No newline at end of file